@@ -2,6 +2,8 @@
 ASGI config for Vigar project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served by uvicorn in the ``events`` compose service for the server-sent
+event streams (/api/projects/<id>/events/); the rest of the API runs on WSGI.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -201,6 +201,24 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+# ---------------------------
+# Idempotency-Key support
+# ---------------------------
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", "60"))
+
+# ---------------------------
+# Health probes
+# ---------------------------
+HEALTH_REFRESH_SECONDS = float(os.environ.get("HEALTH_REFRESH_SECONDS", "5"))
+HEALTH_MAX_STALENESS_SECONDS = float(os.environ.get("HEALTH_MAX_STALENESS_SECONDS", "30"))
+
+# ---------------------------
+# Change event stream (SSE)
+# ---------------------------
+EVENTS_COALESCE_SECONDS = float(os.environ.get("EVENTS_COALESCE_SECONDS", "0.5"))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 CORS_ALLOW_ALL_ORIGINS = True
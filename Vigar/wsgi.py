@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Vigar.settings')
 
 application = get_wsgi_application()
+
+# Load the URLconf (and with it the views) at import time, so a preloading
+# server does it once in the master rather than on each worker's first request.
+get_resolver().url_patterns
@@ -0,0 +1,149 @@
+"""Per-project change notifications for the server-sent event stream.
+
+On PostgreSQL, changes are sent with ``pg_notify`` inside the writing
+transaction, so they are delivered only once it commits, and every ASGI
+process fans them out through a single ``LISTEN`` connection. Other
+databases fall back to dispatching in-process after commit, which only
+reaches subscribers served by the same process.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "vigar_changes"
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 30
+
+
+def uses_listen_notify():
+    return connection.vendor == "postgresql"
+
+
+class Subscription:
+    """Pending events for one stream, keyed by object so bursts coalesce."""
+
+    def __init__(self, project_id, loop):
+        self.project_id = project_id
+        self.loop = loop
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def push(self, event):
+        self.pending[(event["model"], event["id"])] = event
+        self.ready.set()
+
+    async def batches(self, window, heartbeat):
+        """Yield lists of events, at most one per ``window``; ``[]`` on idle ``heartbeat``."""
+        while True:
+            try:
+                await asyncio.wait_for(self.ready.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield []
+                continue
+            await asyncio.sleep(window)
+            self.ready.clear()
+            batch, self.pending = list(self.pending.values()), {}
+            yield batch
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._listener = None
+
+    def subscribe(self, project_id) -> Subscription:
+        if uses_listen_notify():
+            self._ensure_listener()
+        subscription = Subscription(project_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[project_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.project_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.project_id]
+
+    def dispatch(self, event):
+        """Hand ``event`` to the subscribers of its project; safe from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event["project"], ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:  # event loop already closed
+                self.unsubscribe(subscription)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="core-events-listener", daemon=True)
+                self._listener.start()
+
+    def resync(self):
+        """Tell every subscriber it may have missed events and should refetch."""
+        with self._lock:
+            project_ids = list(self._subscriptions)
+        for project_id in project_ids:
+            self.dispatch({"project": project_id, "model": "resync", "id": None, "action": "resync"})
+
+    def _listen(self):
+        """LISTEN forever, reconnecting with backoff when the connection drops."""
+        delay = RECONNECT_MIN_SECONDS
+        reconnecting = False
+        while True:
+            db = connections.create_connection("default")
+            try:
+                raw = self._connect(db)
+                if reconnecting:
+                    self.resync()
+                delay = RECONNECT_MIN_SECONDS
+                self._receive(raw)
+            except Exception:  # noqa: BLE001
+                logger.exception("Change listener lost its connection; reconnecting in %ss", delay)
+            finally:
+                db.close()
+            reconnecting = True
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def _connect(self, db):
+        db.ensure_connection()
+        raw = db.connection
+        raw.autocommit = True
+        with raw.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return raw
+
+    def _receive(self, raw):
+        while True:
+            if select.select([raw], [], [], 5) == ([], [], []):
+                continue
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                self.dispatch(json.loads(notify.payload))
+
+
+broker = Broker()
+
+
+def publish(project_id, model, obj_id, action, **extra):
+    event = {"project": project_id, "model": model, "id": obj_id, "action": action, **extra}
+    if uses_listen_notify():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, json.dumps(event)])
+    else:
+        transaction.on_commit(lambda: broker.dispatch(event))
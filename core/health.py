@@ -0,0 +1,83 @@
+"""Readiness state refreshed in the background, so probes never touch the database.
+
+Each process checks the database and pending migrations every
+``HEALTH_REFRESH_SECONDS`` from a daemon thread. Probes only read the last
+result; one older than ``HEALTH_MAX_STALENESS_SECONDS`` counts as not ready.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def check_db():
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute("SELECT 1")
+        return cursor.fetchone() == (1,)
+
+
+def check_migrations():
+    executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+    return not executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+CHECKS = {"db": check_db, "migrations": check_migrations}
+
+# Migrations only change with a deploy, i.e. a new process, so once this
+# process has seen them applied there is no need to rebuild the graph again.
+STICKY_CHECKS = {"migrations"}
+
+
+class HealthMonitor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._checks = {}
+        self._checked_at = None
+
+    def refresh(self):
+        results = {}
+        for name, check in CHECKS.items():
+            if name in STICKY_CHECKS and self._checks.get(name):
+                results[name] = True
+                continue
+            try:
+                results[name] = bool(check())
+            except Exception:  # noqa: BLE001
+                logger.warning("Health check %s failed", name, exc_info=True)
+                results[name] = False
+        if not results["db"]:
+            connections[DEFAULT_DB_ALIAS].close()
+        self._checks, self._checked_at = results, time.monotonic()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.HEALTH_REFRESH_SECONDS)
+            self.refresh()
+
+    def ensure_started(self):
+        """Check once and start the refresher, per process (threads do not survive fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.refresh()
+            threading.Thread(target=self._run, name="core-health-refresher", daemon=True).start()
+            self._pid = os.getpid()
+
+    def readiness(self):
+        self.ensure_started()
+        age = time.monotonic() - self._checked_at
+        fresh = age <= settings.HEALTH_MAX_STALENESS_SECONDS
+        ready = fresh and all(self._checks.values())
+        return ready, {**self._checks, "fresh": fresh, "age_seconds": round(age, 3)}
+
+
+monitor = HealthMonitor()
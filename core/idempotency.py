@@ -0,0 +1,96 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.status import is_success
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+def _fingerprint(data) -> str:
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _stale(now):
+    """Records a new request may take over: expired results and abandoned claims."""
+    return (Q(created_at__lt=now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL))
+            | Q(status_code__isnull=True,
+                created_at__lt=now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)))
+
+def claim(scope: str, key: str, fingerprint: str):
+    """Reserve ``key`` for this request.
+
+    Concurrent duplicates are serialized by the unique constraint alone: the
+    first insert wins and everyone else gets the existing record back.
+    Returns ``(record, claimed)``.
+    """
+    for _ in range(3):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(scope=scope, key=key, fingerprint=fingerprint, created_at=now)
+            return record, True
+        except IntegrityError:
+            pass
+        record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if record is None:  # released between our insert and lookup
+            continue
+        taken = (IdempotencyKey.objects.filter(Q(pk=record.pk) & _stale(now))
+                 .update(fingerprint=fingerprint, status_code=None, response=None, created_at=now))
+        return record, bool(taken)
+    raise IntegrityError(f"Could not claim idempotency key {key!r}")
+
+def replay(record: IdempotencyKey, fingerprint: str) -> Response:
+    if record.fingerprint != fingerprint:
+        return Response({"detail": "Idempotency-Key was already used with a different request body."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if record.status_code is None:
+        return Response({"detail": "A request with this Idempotency-Key is still in progress."},
+                        status=status.HTTP_409_CONFLICT, headers={"Retry-After": "1"})
+    return Response(record.response, status=record.status_code, headers={"Idempotent-Replayed": "true"})
+
+class IdempotentCreateMixin:
+    """Honour the ``Idempotency-Key`` header on ``create``.
+
+    Successful responses are stored for ``IDEMPOTENCY_KEY_TTL`` seconds and
+    replayed verbatim; failed requests release the key so they can be retried.
+    Keys are scoped per user; anonymous callers have no identity to scope
+    by, so the header is ignored for them.
+    """
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"detail": "Idempotency-Key must be at most 255 characters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        scope = f"{request.user.pk}:{request.path}"
+        fingerprint = _fingerprint(request.data)
+        record, claimed = claim(scope, key, fingerprint)
+        if not claimed:
+            return replay(record, fingerprint)
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if is_success(response.status_code):
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=["status_code", "response"])
+        else:
+            record.delete()
+        return response
+
+def purge_expired() -> int:
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,20 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+def pending_migrations(database=DEFAULT_DB_ALIAS):
+    executor = MigrationExecutor(connections[database])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+class Command(BaseCommand):
+    help = "Run migrate only when there are pending migrations"
+
+    def handle(self, *args, **options):
+        if pending_migrations():
+            call_command("migrate", interactive=False)
+        else:
+            self.stdout.write("No pending migrations, skipping migrate.")
+        self.stdout.write(self.style.SUCCESS("Prestart complete."))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.services import rebuild_workloads
+
+
+class Command(BaseCommand):
+    help = "Recompute per-assignee open task counters from the tasks table"
+
+    def handle(self, *args, **options):
+        rebuild_workloads()
+        self.stdout.write(self.style.SUCCESS("Workloads rebuilt."))
@@ -0,0 +1,73 @@
+import json
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: the same steps a gunicorn worker takes before
+# it can serve its first request.
+PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Vigar.settings")
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({"ready_seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+# Modules that must only be imported by the requests that need them.
+LAZY_MODULES = ["drf_spectacular.views"]
+
+
+def run_probe(importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    result = subprocess.run(cmd + ["-c", PROBE], cwd=settings.BASE_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise CommandError(f"Startup probe failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def parse_importtime(stderr):
+    """Return ``(module, self_us, cumulative_us)`` for top-level imports, slowest first."""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and not match.group(3):
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+class Command(BaseCommand):
+    help = "Measure worker cold start: per-module import time and time until the app is ready"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to list")
+        parser.add_argument("--budget", type=float, default=None,
+                            help="Fail if worker-ready latency exceeds this many seconds")
+
+    def handle(self, *args, **options):
+        probe, _ = run_probe()
+        _, stderr = run_probe(importtime=True)
+
+        self.stdout.write("Slowest top-level imports (cumulative ms / self ms):")
+        for module, self_us, cumulative_us in parse_importtime(stderr)[:options["top"]]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {module}")
+
+        ready = probe["ready_seconds"]
+        self.stdout.write(f"Worker ready in {ready:.3f}s")
+
+        eager = [name for name in LAZY_MODULES if name in probe["modules"]]
+        if eager:
+            raise CommandError(f"Modules loaded at startup that should be lazy: {', '.join(eager)}")
+        budget = options["budget"]
+        if budget is not None and ready > budget:
+            raise CommandError(f"Worker ready in {ready:.3f}s, over the {budget:.3f}s budget")
+        self.stdout.write(self.style.SUCCESS("Startup within budget."))
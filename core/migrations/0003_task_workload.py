@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_workloads(apps, schema_editor):
+    Task = apps.get_model('core', 'Task')
+    AssigneeWorkload = apps.get_model('core', 'AssigneeWorkload')
+    rows = (Task.objects.exclude(status='done').filter(assignee__isnull=False)
+            .values('assignee').annotate(open_tasks=models.Count('id'), hours=models.Sum('estimate_hours'))
+            .order_by())
+    AssigneeWorkload.objects.bulk_create([
+        AssigneeWorkload(user_id=row['assignee'], open_tasks=row['open_tasks'], open_estimate_hours=row['hours'] or 0)
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0002_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssigneeWorkload',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_tasks', models.IntegerField(default=0)),
+                ('open_estimate_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+            ],
+            options={
+                'ordering': ['user_id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status', 'done'), _negated=True), fields=['assignee', 'due_date'], name='task_open_assignee_due_idx'),
+        ),
+        migrations.RunPython(backfill_workloads, migrations.RunPython.noop),
+    ]
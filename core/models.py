@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -45,9 +47,32 @@ class Task(models.Model):
 
     class Meta:
         ordering = ["-id"]
+        indexes = [
+            # Only open tasks are indexed, so overdue lookups stay small as done tasks pile up.
+            models.Index(fields=["assignee", "due_date"], condition=~models.Q(status="done"), name="task_open_assignee_due_idx"),
+        ]
 
     def __str__(self): return self.title
 
+    def save(self, *args, **kwargs):
+        # The workload receivers lock the stored row in pre_save and apply the
+        # change in post_save; both must run in the same transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class AssigneeWorkload(models.Model):
+    """Open task count and estimate per assignee, kept current by ``signals``.
+
+    Queryset ``update()``/``bulk_*`` calls bypass the receivers; run
+    ``rebuild_workloads`` after those.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="workload")
+    open_tasks = models.IntegerField(default=0)
+    open_estimate_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["user_id"]
+
 class TimeEntry(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="time_entries")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="time_entries")
@@ -58,3 +83,15 @@ class TimeEntry(models.Model):
 
     class Meta:
         ordering = ["-date", "-id"]
+
+class IdempotencyKey(models.Model):
+    """Stored result of a create request, replayed for retries with the same key."""
+    scope = models.CharField(max_length=200)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["scope", "key"], name="uniq_idempotency_scope_key")]
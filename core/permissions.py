@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from .selectors import is_project_member
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -21,4 +22,4 @@ class IsProjectMemberOrReadOnly(permissions.BasePermission):
         project = getattr(obj, "project", obj)
         if hasattr(project, "project"):  # TimeEntry -> task.project
             project = project.project
-        return request.user.is_authenticated and project.members.filter(pk=request.user.pk).exists()
+        return request.user.is_authenticated and is_project_member(project.pk, request.user.pk)
@@ -1,20 +1,81 @@
-from django.db.models import Sum
-from .models import Client, Project, Task, TimeEntry
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Min, Prefetch, Sum
+from .models import AssigneeWorkload, Client, Project, Task, TimeEntry
 
-def clients_qs():
-    return Client.objects.all().order_by("name")
+User = get_user_model()
 
-def projects_qs():
-    return Project.objects.select_related("client").prefetch_related("members")
+def _wants(name, fields):
+    return fields is None or name in fields
 
-def tasks_qs():
-    return Task.objects.select_related("project", "assignee", "project__client")
+def _only(qs, fields):
+    """Restrict ``qs`` to the columns backing the requested serializer ``fields``."""
+    if fields is None:
+        return qs
+    opts = qs.model._meta
+    columns = {opts.pk.name}
+    for name in fields:
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and not field.many_to_many:
+            columns.add(field.name)
+    return qs.only(*columns)
 
-def time_entries_qs():
-    return TimeEntry.objects.select_related("task", "user", "task__project", "task__project__client")
+def _related(qs, name, fields, expand):
+    if _wants(name, fields) and name in expand:
+        qs = qs.select_related(name)
+    return qs
+
+def clients_qs(fields=None, expand=None):
+    return _only(Client.objects.all().order_by("name"), fields)
+
+def projects_qs(fields=None, expand=None):
+    if fields is None and expand is None:
+        return Project.objects.select_related("client").prefetch_related("members")
+    expand = expand or set()
+    qs = _related(Project.objects.all(), "client", fields, expand)
+    if _wants("members", fields):
+        if "members" in expand:
+            qs = qs.prefetch_related("members")
+        else:
+            qs = qs.prefetch_related(Prefetch("members", queryset=User.objects.only("pk")))
+    return _only(qs, fields)
+
+def tasks_qs(fields=None, expand=None):
+    if fields is None and expand is None:
+        return Task.objects.select_related("project", "assignee", "project__client")
+    return _only(_related(Task.objects.all(), "assignee", fields, expand or set()), fields)
+
+def time_entries_qs(fields=None, expand=None):
+    if fields is None and expand is None:
+        return TimeEntry.objects.select_related("task", "user", "task__project", "task__project__client")
+    return _only(_related(TimeEntry.objects.all(), "user", fields, expand or set()), fields)
+
+def is_project_member(project_id, user_id) -> bool:
+    return Project.members.through.objects.filter(project_id=project_id, user_id=user_id).exists()
+
+def project_member_ids(project: Project) -> set:
+    return set(Project.members.through.objects.filter(project=project).values_list("user_id", flat=True))
+
+def open_workloads(assignee=None):
+    qs = AssigneeWorkload.objects.filter(open_tasks__gt=0)
+    if assignee:
+        qs = qs.filter(user_id=assignee)
+    return qs
+
+def overdue_by_assignee(today, assignee=None):
+    """Overdue open tasks per assignee; matches the partial index on open tasks."""
+    qs = Task.objects.exclude(status="done").filter(assignee__isnull=False, due_date__lt=today)
+    if assignee:
+        qs = qs.filter(assignee_id=assignee)
+    return (qs.values("assignee")
+              .annotate(overdue_tasks=Count("id"), oldest_due_date=Min("due_date"))
+              .order_by("-overdue_tasks"))
 
 def total_hours_by_project(date_from=None, date_to=None):
-    qs = time_entries_qs()
+    qs = TimeEntry.objects.all()
     if date_from:
         qs = qs.filter(date__gte=date_from)
     if date_to:
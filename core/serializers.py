@@ -1,29 +1,92 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Client, Project, Task, TimeEntry
+from .models import AssigneeWorkload, Client, Project, Task, TimeEntry
+from . import services as svc
 
 User = get_user_model()
 
+def validate_user_ids(user_ids):
+    """Check that every id exists with a single query."""
+    ids = set(user_ids)
+    unknown = ids - set(User.objects.filter(pk__in=ids).values_list("pk", flat=True))
+    if unknown:
+        raise serializers.ValidationError(f"Unknown user ids: {sorted(unknown)}")
+    return ids
+
+class DynamicFieldsMixin:
+    """Apply the ``fields``/``expand`` selection passed in the serializer context.
+
+    Relations listed in ``expandable_fields`` are rendered as primary keys
+    unless named in ``expand``. Without either key the output is unchanged.
+    """
+    expandable_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get("fields")
+        expand = self.context.get("expand")
+        if fields is None and expand is None:
+            return
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in self.expandable_fields:
+            if name in self.fields and name not in (expand or ()):
+                many = isinstance(self.fields[name], serializers.ListSerializer)
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many)
+
 class UserBrief(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id","username","first_name","last_name","email"]
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Client
         fields = "__all__"
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ("client", "members")
     client = ClientSerializer(read_only=True)
     client_id = serializers.PrimaryKeyRelatedField(source="client", queryset=Client.objects.all(), write_only=True)
     members = UserBrief(many=True, read_only=True)
-    member_ids = serializers.PrimaryKeyRelatedField(source="members", many=True, queryset=User.objects.all(), write_only=True, required=False)
+    member_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
     class Meta:
         model = Project
         fields = ["id","name","description","start_date","deadline","status","client","client_id","members","member_ids","created_at"]
 
-class TaskSerializer(serializers.ModelSerializer):
+    def validate_member_ids(self, value):
+        return validate_user_ids(value)
+
+    def create(self, validated_data):
+        member_ids = validated_data.pop("member_ids", None)
+        project = super().create(validated_data)
+        if member_ids:
+            svc.set_project_members(project, member_ids)
+        return project
+
+    def update(self, instance, validated_data):
+        member_ids = validated_data.pop("member_ids", None)
+        project = super().update(instance, validated_data)
+        if member_ids is not None:
+            svc.set_project_members(project, member_ids)
+        return project
+
+class ProjectMembershipSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate_add(self, value):
+        return validate_user_ids(value)
+
+    def validate(self, attrs):
+        attrs["add"], attrs["remove"] = set(attrs["add"]), set(attrs["remove"])
+        if attrs["add"] & attrs["remove"]:
+            raise serializers.ValidationError({"remove": "A user cannot be both added and removed."})
+        return attrs
+
+class TaskSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ("assignee",)
     project_id = serializers.PrimaryKeyRelatedField(source="project", queryset=Project.objects.all(), write_only=True)
     assignee = UserBrief(read_only=True)
     assignee_id = serializers.PrimaryKeyRelatedField(source="assignee", queryset=User.objects.all(), write_only=True, allow_null=True, required=False)
@@ -31,7 +94,14 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = ["id","title","description","status","estimate_hours","due_date","project_id","assignee","assignee_id","created_at"]
 
-class TimeEntrySerializer(serializers.ModelSerializer):
+class AssigneeWorkloadSerializer(serializers.ModelSerializer):
+    user_id = serializers.IntegerField(read_only=True)
+    class Meta:
+        model = AssigneeWorkload
+        fields = ["user_id","open_tasks","open_estimate_hours"]
+
+class TimeEntrySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ("user",)
     task_id = serializers.PrimaryKeyRelatedField(source="task", queryset=Task.objects.all(), write_only=True)
     user = UserBrief(read_only=True)
     user_id = serializers.PrimaryKeyRelatedField(source="user", queryset=User.objects.all(), write_only=True)
@@ -1,18 +1,94 @@
+from decimal import Decimal
 from django.db import transaction
-from .models import Project, Task, TimeEntry
+from django.db.models import Count, F, Sum
+from .models import AssigneeWorkload, Project, Task, TimeEntry
+from .selectors import project_member_ids
 from .validators import validate_member_is_in_project
 
 @transaction.atomic
 def add_project_member(project: Project, user):
-    project.members.add(user)
+    update_project_members(project, add={user.pk})
     return project
 
+@transaction.atomic
+def update_project_members(project: Project, *, add=(), remove=()):
+    """Add and remove members by user id, touching only rows that change.
+
+    Works on the through table directly so each side costs one statement
+    after a single lookup of the affected ids. Returns the ``(added, removed)`` id sets.
+    """
+    add, remove = set(add), set(remove)
+    through = Project.members.through
+    current = set(through.objects.filter(project=project, user_id__in=add | remove)
+                                 .values_list("user_id", flat=True))
+    added, removed = add - current, remove & current
+    if added:
+        through.objects.bulk_create([through(project_id=project.pk, user_id=user_id) for user_id in added],
+                                    ignore_conflicts=True)
+    if removed:
+        through.objects.filter(project=project, user_id__in=removed).delete()
+    return added, removed
+
+@transaction.atomic
+def set_project_members(project: Project, user_ids):
+    current = project_member_ids(project)
+    target = set(user_ids)
+    return update_project_members(project, add=target - current, remove=current - target)
+
+def task_open_load(task: Task):
+    """``(assignee_id, hours)`` a task adds to its assignee's workload, or ``None``."""
+    if task.assignee_id is None or task.status == "done":
+        return None
+    return task.assignee_id, Decimal(str(task.estimate_hours or 0))
+
+def stored_task_load(task: Task):
+    """Open load of ``task``'s stored row, locked until the transaction ends."""
+    if task.pk is None:
+        return None
+    current = Task.objects.select_for_update().filter(pk=task.pk).first()
+    return task_open_load(current) if current else None
+
+def adjust_workload(user_id, tasks: int, hours: Decimal):
+    if not tasks and not hours:
+        return
+    changes = {"open_tasks": F("open_tasks") + tasks, "open_estimate_hours": F("open_estimate_hours") + hours}
+    if not AssigneeWorkload.objects.filter(user_id=user_id).update(**changes):
+        AssigneeWorkload.objects.get_or_create(user_id=user_id)
+        AssigneeWorkload.objects.filter(user_id=user_id).update(**changes)
+
+def move_workload(before, after):
+    if before == after:
+        return
+    if before:
+        adjust_workload(before[0], -1, -before[1])
+    if after:
+        adjust_workload(after[0], 1, after[1])
+
 @transaction.atomic
 def create_task(*, project: Project, title: str, assignee=None, **kwargs) -> Task:
     if assignee:
         validate_member_is_in_project(assignee, project)
     return Task.objects.create(project=project, title=title, assignee=assignee, **kwargs)
 
+@transaction.atomic
+def update_task(task: Task, **changes) -> Task:
+    for field, value in changes.items():
+        setattr(task, field, value)
+    task.save()
+    return task
+
+@transaction.atomic
+def rebuild_workloads():
+    """Recompute every workload counter from the tasks table."""
+    AssigneeWorkload.objects.all().delete()
+    rows = (Task.objects.exclude(status="done").filter(assignee__isnull=False)
+            .values("assignee").annotate(open_tasks=Count("id"), hours=Sum("estimate_hours"))
+            .order_by())
+    AssigneeWorkload.objects.bulk_create([
+        AssigneeWorkload(user_id=row["assignee"], open_tasks=row["open_tasks"], open_estimate_hours=row["hours"] or 0)
+        for row in rows
+    ])
+
 @transaction.atomic
 def log_time(*, task: Task, user, date, hours, note=None) -> TimeEntry:
     return TimeEntry.objects.create(task=task, user=user, date=date, hours=hours, note=note)
@@ -0,0 +1,51 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .events import publish
+from .services import move_workload, stored_task_load, task_open_load
+from .models import Task, TimeEntry
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def publish_task_change(sender, instance, **kwargs):
+    action = "deleted" if "created" not in kwargs else "saved"
+    publish(instance.project_id, "task", instance.pk, action, status=instance.status)
+
+
+# Workload counters are maintained only here, so every write path (services,
+# admin, plain model saves, cascades) moves them the same way.
+@receiver(pre_save, sender=Task)
+def capture_task_workload(sender, instance, **kwargs):
+    instance._workload_before = stored_task_load(instance)
+
+
+@receiver(post_save, sender=Task)
+def apply_task_workload(sender, instance, **kwargs):
+    move_workload(instance._workload_before, task_open_load(instance))
+
+
+@receiver(pre_delete, sender=Task)
+def capture_deleted_task_workload(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Task):
+        instance._workload_before = stored_task_load(instance)
+    else:  # cascade or queryset delete: the rows were collected for this delete
+        instance._workload_before = task_open_load(instance)
+
+
+@receiver(post_delete, sender=Task)
+def release_task_workload(sender, instance, **kwargs):
+    move_workload(instance._workload_before, None)
+
+
+@receiver(post_save, sender=TimeEntry)
+@receiver(post_delete, sender=TimeEntry)
+def publish_time_entry_change(sender, instance, **kwargs):
+    action = "deleted" if "created" not in kwargs else "saved"
+    origin = kwargs.get("origin")
+    if action == "deleted" and not (isinstance(origin, TimeEntry) or getattr(origin, "model", None) is TimeEntry):
+        return  # cascaded from a task/project/user delete, which is reported on its own
+    try:
+        project_id = instance.task.project_id
+    except ObjectDoesNotExist:  # task removed in the same cascade
+        return
+    publish(project_id, "time_entry", instance.pk, action)
@@ -1 +1,473 @@
-# Create your tests here.
+import asyncio
+import json
+import os
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .events import Broker
+from .health import HealthMonitor
+from .idempotency import _fingerprint
+from . import services as svc
+from .models import AssigneeWorkload, Client, IdempotencyKey, Project, Task, TimeEntry
+from .selectors import is_project_member
+
+User = get_user_model()
+
+
+class ColdStartBudgetTests(SimpleTestCase):
+    def test_worker_ready_within_budget(self):
+        # Fails if startup gets slower than the budget or a lazy module
+        # (e.g. the OpenAPI docs views) starts being imported eagerly again.
+        budget = float(os.environ.get("STARTUP_BUDGET_SECONDS", "5"))
+        call_command("startup_report", budget=budget, top=0, stdout=StringIO())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("member", email="member@example.com")
+        self.acme = Client.objects.create(name="ACME")
+        self.project = Project.objects.create(client=self.acme, name="Website")
+        self.project.members.add(self.user)
+        self.task = Task.objects.create(project=self.project, title="Setup", assignee=self.user)
+        TimeEntry.objects.create(task=self.task, user=self.user, date="2025-01-01", hours=2, note="kickoff")
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        selects = [q["sql"] for q in queries.captured_queries if "COUNT(*)" not in q["sql"]]
+        return resp.json()["results"], selects
+
+    def test_fields_limit_columns_and_joins(self):
+        results, selects = self.get("/api/time-entries/?fields=id,hours,date")
+        self.assertEqual(results, [{"id": results[0]["id"], "date": "2025-01-01", "hours": "2.00"}])
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn("JOIN", selects[0])
+        self.assertNotIn('"note"', selects[0])
+        self.assertNotIn('"created_at"', selects[0])
+
+    def test_unexpanded_relations_are_ids(self):
+        projects, selects = self.get("/api/projects/?fields=id,client,members")
+        self.assertEqual(projects[0]["client"], self.acme.pk)
+        self.assertEqual(projects[0]["members"], [self.user.pk])
+        self.assertNotIn('"auth_user"."username"', "".join(selects))
+        tasks, selects = self.get("/api/tasks/?fields=id,assignee")
+        self.assertEqual(tasks[0]["assignee"], self.user.pk)
+        self.assertNotIn("auth_user", selects[0])
+        entries, _ = self.get("/api/time-entries/?fields=id,user")
+        self.assertEqual(entries[0]["user"], self.user.pk)
+
+    def test_expand_embeds_with_one_query_per_relation(self):
+        projects, selects = self.get("/api/projects/?fields=id,client,members&expand=client,members")
+        self.assertEqual(projects[0]["client"]["name"], "ACME")
+        self.assertEqual(projects[0]["members"][0]["username"], "member")
+        self.assertEqual(len(selects), 2)  # projects JOIN client, then one members prefetch
+        self.assertIn('"core_client"."name"', selects[0])
+        tasks, selects = self.get("/api/tasks/?expand=assignee")
+        self.assertEqual(tasks[0]["assignee"]["username"], "member")
+        self.assertEqual(len(selects), 1)
+        self.assertIn('"auth_user"."username"', selects[0])
+        entries, selects = self.get("/api/time-entries/?fields=id,user&expand=user")
+        self.assertEqual(entries[0]["user"]["email"], "member@example.com")
+        self.assertEqual(len(selects), 1)
+
+    def test_no_params_keep_full_representation(self):
+        projects, _ = self.get("/api/projects/")
+        self.assertEqual(set(projects[0]), {"id", "name", "description", "start_date", "deadline", "status",
+                                            "client", "members", "created_at"})
+        self.assertEqual(projects[0]["client"]["name"], "ACME")
+        self.assertEqual(projects[0]["members"][0]["id"], self.user.pk)
+        entries, _ = self.get("/api/time-entries/")
+        self.assertEqual(set(entries[0]), {"id", "date", "hours", "note", "user", "created_at"})
+        self.assertEqual(entries[0]["user"]["username"], "member")
+
+    def test_fields_are_ignored_on_writes(self):
+        resp = self.client.post("/api/clients/?fields=id", {"name": "Globex", "note": "new"}, format="json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()["note"], "new")
+        self.assertTrue(Client.objects.filter(name="Globex", note="new").exists())
+        other = User.objects.create_user("other")
+        resp = self.client.patch(f"/api/projects/{self.project.pk}/?fields=id&expand=",
+                                 {"member_ids": [other.pk], "status": "on_hold"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["status"], "on_hold")
+        self.assertEqual(list(self.project.members.values_list("pk", flat=True)), [other.pk])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ProjectMembershipTests(APITestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f"user{i}") for i in range(4)]
+        self.project = Project.objects.create(client=Client.objects.create(name="ACME"), name="Website")
+        self.project.members.add(self.users[0], self.users[1])
+        self.url = f"/api/projects/{self.project.pk}/members/"
+
+    def member_ids(self):
+        return set(self.project.members.values_list("pk", flat=True))
+
+    def test_adds_and_removes_only_changed_members(self):
+        u0, u1, u2, u3 = (u.pk for u in self.users)
+        resp = self.client.post(self.url, {"add": [u0, u2], "remove": [u1, u3]}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"added": [u2], "removed": [u1]})
+        self.assertEqual(self.member_ids(), {u0, u2})
+
+    def test_unknown_user_is_rejected_without_changes(self):
+        resp = self.client.post(self.url, {"add": [self.users[2].pk, 999999]}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.member_ids(), {self.users[0].pk, self.users[1].pk})
+
+    def test_same_user_in_add_and_remove_is_rejected(self):
+        pk = self.users[2].pk
+        resp = self.client.post(self.url, {"add": [pk], "remove": [pk]}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_member_ids_on_update_replaces_the_set(self):
+        target = {self.users[1].pk, self.users[3].pk}
+        resp = self.client.patch(f"/api/projects/{self.project.pk}/", {"member_ids": sorted(target)}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual({m["id"] for m in resp.json()["members"]}, target)
+        self.assertEqual(self.member_ids(), target)
+
+    def test_removed_member_loses_write_access_immediately(self):
+        self.assertTrue(is_project_member(self.project.pk, self.users[1].pk))
+        self.client.post(self.url, {"remove": [self.users[1].pk]}, format="json")
+        self.assertFalse(is_project_member(self.project.pk, self.users[1].pk))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, IDEMPOTENCY_KEY_TTL=3600, IDEMPOTENCY_LOCK_TIMEOUT=60)
+class IdempotencyKeyTests(APITestCase):
+    url = "/api/time-entries/"
+
+    def setUp(self):
+        self.user = User.objects.create_user("worker")
+        project = Project.objects.create(client=Client.objects.create(name="ACME"), name="Website")
+        project.members.add(self.user)
+        self.task = Task.objects.create(project=project, title="Setup", assignee=self.user)
+        self.body = {"task_id": self.task.pk, "user_id": self.user.pk, "date": "2025-01-01", "hours": "2.50"}
+        self.scope = f"{self.user.pk}:{self.url}"
+        self.client.force_authenticate(self.user)
+
+    def post(self, body=None, key="retry-1"):
+        return self.client.post(self.url, body or self.body, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_first_response(self):
+        first = self.post()
+        second = self.post()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+        self.assertEqual(TimeEntry.objects.count(), 1)
+
+    def test_replay_skips_service(self):
+        self.post()
+        with mock.patch("core.services.log_time") as log_time:
+            self.post()
+        log_time.assert_not_called()
+
+    def test_different_body_with_same_key_is_rejected(self):
+        self.post()
+        resp = self.post({**self.body, "hours": "3.00"})
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(TimeEntry.objects.count(), 1)
+
+    def test_request_in_flight_returns_conflict(self):
+        IdempotencyKey.objects.create(scope=self.scope, key="retry-1", fingerprint=_fingerprint(self.body))
+        resp = self.post()
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(TimeEntry.objects.count(), 0)
+
+    def test_abandoned_claim_is_taken_over(self):
+        IdempotencyKey.objects.create(scope=self.scope, key="retry-1", fingerprint=_fingerprint(self.body),
+                                      created_at=timezone.now() - timedelta(seconds=120))
+        resp = self.post()
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get(key="retry-1").status_code, 201)
+
+    def test_expired_result_is_taken_over(self):
+        IdempotencyKey.objects.create(scope=self.scope, key="retry-1", fingerprint="old", status_code=201,
+                                      response={"id": 0}, created_at=timezone.now() - timedelta(hours=2))
+        resp = self.post()
+        self.assertEqual(resp.status_code, 201)
+        self.assertNotEqual(resp.json()["id"], 0)
+        self.assertEqual(TimeEntry.objects.count(), 1)
+
+    def test_client_error_releases_key(self):
+        resp = self.post({**self.body, "hours": "lots"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post().status_code, 201)
+
+    def test_exception_releases_key(self):
+        with mock.patch("core.services.log_time", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.post()
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_keys_are_scoped_per_user(self):
+        other = User.objects.create_user("other")
+        self.post()
+        self.client.force_authenticate(other)
+        resp = self.post({**self.body, "user_id": other.pk})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(TimeEntry.objects.count(), 2)
+
+    def test_anonymous_requests_ignore_key(self):
+        self.client.force_authenticate(None)
+        first = self.client.post("/api/clients/", {"name": "One"}, format="json", HTTP_IDEMPOTENCY_KEY="shared")
+        second = self.client.post("/api/clients/", {"name": "Two"}, format="json", HTTP_IDEMPOTENCY_KEY="shared")
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertNotEqual(first.json()["id"], second.json()["id"])
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, EVENTS_COALESCE_SECONDS=0.05, EVENTS_HEARTBEAT_SECONDS=0.3)
+class ProjectEventsTests(APITestCase):
+    def setUp(self):
+        self.member = User.objects.create_user("member")
+        self.outsider = User.objects.create_user("outsider")
+        acme = Client.objects.create(name="ACME")
+        self.project = Project.objects.create(client=acme, name="Website")
+        self.other_project = Project.objects.create(client=acme, name="Shop")
+        self.project.members.add(self.member)
+        self.other_project.members.add(self.member)
+        self.url = f"/api/projects/{self.project.pk}/events/"
+
+    def auth(self, user):
+        return {"Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    async def open_stream(self):
+        resp = await self.async_client.get(self.url, headers=self.auth(self.member))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        stream = resp.streaming_content.__aiter__()
+        self.assertEqual(await stream.__anext__(), b"retry: 3000\n\n")  # subscribed from here on
+        return stream
+
+    async def next_message(self, stream):
+        return (await asyncio.wait_for(stream.__anext__(), 2)).decode()
+
+    def write(self, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            return action()
+
+    def test_stream_is_refused_outside_asgi(self):
+        self.client.force_authenticate(self.member)
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(resp.streaming)
+
+    async def test_requires_token(self):
+        resp = await self.async_client.get(self.url)
+        self.assertEqual(resp.status_code, 401)
+
+    async def test_rejects_non_members(self):
+        resp = await self.async_client.get(self.url, headers=self.auth(self.outsider))
+        self.assertEqual(resp.status_code, 403)
+
+    async def test_burst_is_coalesced_to_latest_state(self):
+        stream = await self.open_stream()
+
+        def burst():
+            task = Task.objects.create(project=self.project, title="Burst")
+            for status in ["in_progress", "done"]:
+                task.status = status
+                task.save()
+            return task.pk
+
+        task_id = await sync_to_async(self.write)(burst)
+        message = await self.next_message(stream)
+        self.assertTrue(message.startswith("event: changes\n"))
+        events = json.loads(message.split("data: ", 1)[1])
+        self.assertEqual(events, [{"project": self.project.pk, "model": "task", "id": task_id,
+                                   "action": "saved", "status": "done"}])
+        await stream.aclose()
+
+    async def test_other_projects_are_not_delivered(self):
+        stream = await self.open_stream()
+        await sync_to_async(self.write)(lambda: Task.objects.create(project=self.other_project, title="Elsewhere"))
+        self.assertEqual(await self.next_message(stream), ": keep-alive\n\n")
+        await stream.aclose()
+
+    def test_cascaded_time_entry_deletes_are_not_published(self):
+        task = Task.objects.create(project=self.project, title="Logged")
+        entry = TimeEntry.objects.create(task=task, user=self.member, date="2025-01-01", hours=1)
+        with mock.patch("core.signals.publish") as publish:
+            task.delete()
+        published = [(c.args[1], c.args[3]) for c in publish.call_args_list]
+        self.assertEqual(published, [("task", "deleted")])
+        with mock.patch("core.signals.publish") as publish:
+            TimeEntry.objects.create(task=Task.objects.create(project=self.project, title="Kept"),
+                                     user=self.member, date="2025-01-01", hours=1).delete()
+        self.assertIn(("time_entry", "deleted"), [(c.args[1], c.args[3]) for c in publish.call_args_list])
+        self.assertFalse(TimeEntry.objects.filter(pk=entry.pk).exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class HealthProbeTests(TestCase):
+    def test_probes_do_not_query_the_database(self):
+        with mock.patch("core.health.threading.Thread"):  # no refresher thread in tests
+            self.client.get("/api/health/ready/")
+        with CaptureQueriesContext(connection) as queries:
+            for url in ["/api/health/live/", "/api/health/ready/", "/api/health/"]:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+    def test_stale_state_is_not_ready(self):
+        monitor = HealthMonitor()
+        monitor.refresh()
+        monitor._pid = os.getpid()
+        monitor._checked_at -= 3600
+        ready, checks = monitor.readiness()
+        self.assertFalse(ready)
+        self.assertFalse(checks["fresh"])
+
+    def test_clean_migrations_are_not_rechecked(self):
+        monitor = HealthMonitor()
+        monitor.refresh()
+        with mock.patch("core.health.MigrationExecutor") as executor:
+            monitor.refresh()
+        executor.assert_not_called()
+        self.assertTrue(monitor._checks["migrations"])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class WorkloadTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.project = Project.objects.create(client=Client.objects.create(name="ACME"), name="Website")
+        self.project.members.add(self.alice, self.bob)
+        self.client.force_authenticate(self.alice)
+
+    def create(self, assignee, hours, **extra):
+        body = {"project_id": self.project.pk, "title": "Task", "assignee_id": assignee.pk, "estimate_hours": hours, **extra}
+        resp = self.client.post("/api/tasks/", body, format="json")
+        self.assertEqual(resp.status_code, 201)
+        return resp.json()["id"]
+
+    def workload(self, user):
+        row = AssigneeWorkload.objects.filter(user=user).first()
+        return (row.open_tasks, str(row.open_estimate_hours)) if row else (0, "0")
+
+    def assert_matches_rebuild(self):
+        before = {w.user_id: (w.open_tasks, w.open_estimate_hours) for w in AssigneeWorkload.objects.filter(open_tasks__gt=0)}
+        svc.rebuild_workloads()
+        self.assertEqual(before, {w.user_id: (w.open_tasks, w.open_estimate_hours) for w in AssigneeWorkload.objects.all()})
+
+    def test_create_counts_open_tasks_only(self):
+        self.create(self.alice, "2.50")
+        self.create(self.alice, "1.00", status="done")
+        self.assertEqual(self.workload(self.alice), (1, "2.50"))
+        self.assert_matches_rebuild()
+
+    def test_update_status_and_estimate(self):
+        task = self.create(self.alice, "2.00")
+        self.client.patch(f"/api/tasks/{task}/", {"estimate_hours": "5.00"}, format="json")
+        self.assertEqual(self.workload(self.alice), (1, "5.00"))
+        self.client.patch(f"/api/tasks/{task}/", {"status": "done"}, format="json")
+        self.assertEqual(self.workload(self.alice)[0], 0)
+        self.client.patch(f"/api/tasks/{task}/", {"status": "done"}, format="json")
+        self.assertEqual(self.workload(self.alice)[0], 0)
+        self.assert_matches_rebuild()
+
+    def test_update_from_stale_instance_uses_current_row(self):
+        task_id = self.create(self.alice, "2.00")
+        first, second = Task.objects.get(pk=task_id), Task.objects.get(pk=task_id)
+        svc.update_task(first, status="done")
+        svc.update_task(second, status="done")
+        self.assertEqual(self.workload(self.alice)[0], 0)
+        self.assert_matches_rebuild()
+
+    def test_reassign_moves_load(self):
+        task = self.create(self.alice, "3.00")
+        self.client.patch(f"/api/tasks/{task}/", {"assignee_id": self.bob.pk}, format="json")
+        self.assertEqual(self.workload(self.alice)[0], 0)
+        self.assertEqual(self.workload(self.bob), (1, "3.00"))
+        self.assert_matches_rebuild()
+
+    def test_delete_and_project_cascade_release_load(self):
+        task = self.create(self.alice, "1.00")
+        self.create(self.alice, "2.00")
+        self.create(self.bob, "4.00")
+        self.client.delete(f"/api/tasks/{task}/")
+        self.assertEqual(self.workload(self.alice), (1, "2.00"))
+        self.project.delete()
+        self.assertEqual(self.workload(self.alice)[0], 0)
+        self.assertEqual(self.workload(self.bob)[0], 0)
+
+    def test_model_writes_outside_services_keep_counters(self):
+        task = Task.objects.create(project=self.project, title="Direct", assignee=self.alice, estimate_hours=5)
+        self.assertEqual(self.workload(self.alice), (1, "5.00"))
+        task.assignee = self.bob
+        task.save()
+        task.status = "done"
+        task.save()
+        self.assert_matches_rebuild()
+        other = Task.objects.create(project=self.project, title="Direct", assignee=self.alice, estimate_hours=2)
+        other.delete()
+        task.delete()
+        self.assertEqual(self.workload(self.alice)[0], 0)
+        self.assertEqual(self.workload(self.bob)[0], 0)
+        self.assert_matches_rebuild()
+
+    def test_admin_edit_keeps_counters(self):
+        admin = User.objects.create_superuser("admin", password="pw")
+        task = Task.objects.create(project=self.project, title="Admin", assignee=self.alice, estimate_hours=3)
+        self.client.force_login(admin)
+        resp = self.client.post(f"/admin/core/task/{task.pk}/change/", {
+            "project": self.project.pk, "title": "Admin", "assignee": self.bob.pk,
+            "status": "in_progress", "estimate_hours": "4.00",
+        })
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(self.workload(self.alice)[0], 0)
+        self.assertEqual(self.workload(self.bob), (1, "4.00"))
+        self.assert_matches_rebuild()
+
+    def test_workload_endpoint_returns_decimal_strings(self):
+        self.create(self.alice, "2.00")
+        resp = self.client.get(f"/api/tasks/workload/?assignee={self.alice.pk}")
+        self.assertEqual(resp.json(), [{"user_id": self.alice.pk, "open_tasks": 1, "open_estimate_hours": "2.00"}])
+
+    def test_overdue_endpoint_counts_open_past_due_tasks(self):
+        self.create(self.alice, "1.00", due_date="2020-01-01")
+        self.create(self.alice, "1.00", due_date="2020-01-01", status="done")
+        self.create(self.alice, "1.00", due_date="2999-01-01")
+        resp = self.client.get("/api/tasks/overdue/")
+        self.assertEqual(resp.json(), [{"assignee": self.alice.pk, "overdue_tasks": 1, "oldest_due_date": "2020-01-01"}])
+
+    def test_non_integer_assignee_is_rejected(self):
+        for url in ["/api/tasks/workload/", "/api/tasks/overdue/"]:
+            self.assertEqual(self.client.get(f"{url}?assignee=abc").status_code, 400)
+
+
+class ListenerReconnectTests(SimpleTestCase):
+    async def test_listener_reconnects_with_backoff_and_resyncs(self):
+        class Stop(BaseException):
+            pass
+
+        broker = Broker()
+        subscription = broker.subscribe(7)
+        with mock.patch("core.events.connections.create_connection"), \
+                mock.patch("core.events.time.sleep") as sleep, \
+                mock.patch.object(broker, "_connect", side_effect=[OSError("down"), OSError("down"), object()]), \
+                mock.patch.object(broker, "_receive", side_effect=Stop):
+            with self.assertRaises(Stop):
+                broker._listen()
+        await asyncio.sleep(0)  # run the dispatched push
+        self.assertEqual([c.args for c in sleep.call_args_list], [(1,), (2,)])
+        self.assertEqual([e["action"] for e in subscription.pending.values()], ["resync"])
@@ -10,7 +10,9 @@ from .views import (
     ProjectViewSet,
     TaskViewSet,
     TimeEntryViewSet,
-    health,
+    health_live,
+    health_ready,
+    project_events,
     register,
 )
 
@@ -21,8 +23,11 @@ router.register(r"tasks", TaskViewSet)
 router.register(r"time-entries", TimeEntryViewSet)
 
 urlpatterns = [
-    path("health/", health),
+    path("health/", health_ready),
+    path("health/live/", health_live),
+    path("health/ready/", health_ready),
     path("auth/register/", register),
+    path("projects/<int:project_id>/events/", project_events, name="project-events"),
     path("auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("auth/verify/", TokenVerifyView.as_view(), name="token_verify"),
@@ -1,5 +1,6 @@
 from django.core.exceptions import ValidationError
+from .selectors import is_project_member
 
 def validate_member_is_in_project(user, project):
-    if user and not project.members.filter(pk=user.pk).exists():
+    if user and not is_project_member(project.pk, user.pk):
         raise ValidationError("Assignee must be a member of the project.")
@@ -1,5 +1,8 @@
+import json
+
 from rest_framework import viewsets, decorators, response
-from rest_framework.permissions import AllowAny
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, SAFE_METHODS
 from django_filters.rest_framework import DjangoFilterBackend
 from . import selectors as sel, services as svc
 from .permissions import IsProjectMemberOrReadOnly
@@ -9,28 +12,137 @@ from .serializers import (
     TaskSerializer,
     TimeEntrySerializer,
     RegisterSerializer,
+    ProjectMembershipSerializer,
+    AssigneeWorkloadSerializer,
 )
 from .filters import ProjectFilter, TaskFilter, TimeEntryFilter
+from .idempotency import IDEMPOTENCY_HEADER, IdempotentCreateMixin
 from .models import Project
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import connection
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter # pyright: ignore[reportMissingImports]
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from .events import broker
+from .health import monitor
+
+SPARSE_PARAMETERS = [
+    OpenApiParameter(name="fields", required=False, location=OpenApiParameter.QUERY, description="Comma-separated fields to return"),
+    OpenApiParameter(name="expand", required=False, location=OpenApiParameter.QUERY, description="Comma-separated relations to embed; others are returned as ids"),
+]
+
+IDEMPOTENCY_PARAMETERS = [
+    OpenApiParameter(name=IDEMPOTENCY_HEADER, required=False, location=OpenApiParameter.HEADER, description="Retries with the same key replay the first response"),
+]
+
+class SparseFieldsetMixin:
+    """Shape read queries and responses from the ``fields`` and ``expand`` query params.
+
+    ``selector`` builds the queryset for the requested fields so that unused
+    columns and relations are never loaded. Writes keep the full queryset.
+    """
+    selector = None
+
+    def _csv_param(self, name):
+        raw = self.request.query_params.get(name)
+        if raw is None:
+            return None
+        return {part.strip() for part in raw.split(",") if part.strip()}
+
+    def _sparse_enabled(self):
+        return self.request is not None and self.request.method in SAFE_METHODS
+
+    def get_queryset(self):
+        if not self._sparse_enabled():
+            return super().get_queryset()
+        return self.selector(fields=self._csv_param("fields"), expand=self._csv_param("expand"))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self._sparse_enabled():
+            context["fields"] = self._csv_param("fields")
+            context["expand"] = self._csv_param("expand")
+        return context
+
+def _int_query_param(request, name):
+    raw = request.query_params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValidationError({name: "A valid integer is required."}) from None
+
+# Probes are plain Django views: no DRF authentication or content negotiation.
+def health_live(_request):
+    return JsonResponse({"status": "ok"})
+
+def health_ready(_request):
+    ready, checks = monitor.readiness()
+    return JsonResponse({"status": "ok" if ready else "degraded", **checks},
+                        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
 
-@api_view(["GET"])
-def health(_request):
-    db_ok = False
+def _stream_user(request):
+    """Authenticate an event stream by JWT header or ``access_token`` query param.
+
+    Browsers' EventSource cannot send headers, hence the query param.
+    """
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else request.GET.get("access_token")
+    if not raw_token:
+        return None
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-            db_ok = cursor.fetchone() == (1,)
-    except Exception:  # noqa: BLE001
-        db_ok = False
-    status_code = status.HTTP_200_OK if db_ok else status.HTTP_503_SERVICE_UNAVAILABLE
-    return Response({"status": "ok" if db_ok else "degraded", "db": db_ok}, status=status_code)
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+async def project_events(request, project_id):
+    """Server-sent events for task and time entry changes in one project.
+
+    Only served under ASGI: WSGI would buffer the endless stream and pin a
+    sync worker per subscriber.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "Event streams are only served by the ASGI events service."}, status=400)
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    is_member = sync_to_async(sel.is_project_member)
+    if not await is_member(project_id, user.pk):
+        return JsonResponse({"detail": "You are not a member of this project."}, status=403)
+
+    async def stream():
+        subscription = broker.subscribe(project_id)
+        try:
+            yield "retry: 3000\n\n"
+            async for batch in subscription.batches(settings.EVENTS_COALESCE_SECONDS,
+                                                    settings.EVENTS_HEARTBEAT_SECONDS):
+                if not batch:
+                    yield ": keep-alive\n\n"
+                    continue
+                if not await is_member(project_id, user.pk):
+                    return
+                changes = [event for event in batch if event["action"] != "resync"]
+                if len(changes) < len(batch):
+                    yield "event: resync\ndata: {}\n\n"
+                if changes:
+                    yield f"event: changes\ndata: {json.dumps(changes)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 @extend_schema(summary="Register new user", tags=["Auth"], request=RegisterSerializer)
 @api_view(["POST"])
@@ -52,44 +164,66 @@ def register(request):
  
 
 @extend_schema_view(
-    list=extend_schema(summary="List clients", tags=["Clients"]),
-    retrieve=extend_schema(summary="Get client", tags=["Clients"]),
-    create=extend_schema(summary="Create client", tags=["Clients"]),
+    list=extend_schema(summary="List clients", tags=["Clients"], parameters=SPARSE_PARAMETERS),
+    retrieve=extend_schema(summary="Get client", tags=["Clients"], parameters=SPARSE_PARAMETERS),
+    create=extend_schema(summary="Create client", tags=["Clients"], parameters=IDEMPOTENCY_PARAMETERS),
     update=extend_schema(summary="Update client", tags=["Clients"]),
     partial_update=extend_schema(summary="Patch client", tags=["Clients"]),
     destroy=extend_schema(summary="Delete client", tags=["Clients"]),
 )
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(IdempotentCreateMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = sel.clients_qs()
+    selector = staticmethod(sel.clients_qs)
     serializer_class = ClientSerializer
     permission_classes = [AllowAny]
     filter_backends = [DjangoFilterBackend]
 
 @extend_schema_view(
-    list=extend_schema(summary="List projects", tags=["Projects"]),
-    retrieve=extend_schema(summary="Get project", tags=["Projects"]),
-    create=extend_schema(summary="Create project", tags=["Projects"]),
+    list=extend_schema(summary="List projects", tags=["Projects"], parameters=SPARSE_PARAMETERS),
+    retrieve=extend_schema(summary="Get project", tags=["Projects"], parameters=SPARSE_PARAMETERS),
+    create=extend_schema(summary="Create project", tags=["Projects"], parameters=IDEMPOTENCY_PARAMETERS),
     update=extend_schema(summary="Update project", tags=["Projects"]),
     partial_update=extend_schema(summary="Patch project", tags=["Projects"]),
     destroy=extend_schema(summary="Delete project", tags=["Projects"]),
 )
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(IdempotentCreateMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = sel.projects_qs()
+    selector = staticmethod(sel.projects_qs)
     serializer_class = ProjectSerializer
     permission_classes = [AllowAny]
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProjectFilter
 
+    def get_queryset(self):
+        if self.action == "update_members":
+            return Project.objects.all()
+        return super().get_queryset()
+
+    @extend_schema(
+        summary="Add or remove project members",
+        tags=["Projects"],
+        request=ProjectMembershipSerializer,
+        responses={200: None},
+    )
+    @decorators.action(detail=True, methods=["post"], url_path="members")
+    def update_members(self, request, pk=None):
+        project = self.get_object()
+        serializer = ProjectMembershipSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        added, removed = svc.update_project_members(project, **serializer.validated_data)
+        return response.Response({"added": sorted(added), "removed": sorted(removed)})
+
 @extend_schema_view(
-    list=extend_schema(summary="List tasks", tags=["Tasks"]),
-    retrieve=extend_schema(summary="Get task", tags=["Tasks"]),
-    create=extend_schema(summary="Create task", tags=["Tasks"]),
+    list=extend_schema(summary="List tasks", tags=["Tasks"], parameters=SPARSE_PARAMETERS),
+    retrieve=extend_schema(summary="Get task", tags=["Tasks"], parameters=SPARSE_PARAMETERS),
+    create=extend_schema(summary="Create task", tags=["Tasks"], parameters=IDEMPOTENCY_PARAMETERS),
     update=extend_schema(summary="Update task", tags=["Tasks"]),
     partial_update=extend_schema(summary="Patch task", tags=["Tasks"]),
     destroy=extend_schema(summary="Delete task", tags=["Tasks"]),
 )
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(IdempotentCreateMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = sel.tasks_qs()
+    selector = staticmethod(sel.tasks_qs)
     serializer_class = TaskSerializer
     permission_classes = [IsProjectMemberOrReadOnly]
     filter_backends = [DjangoFilterBackend]
@@ -106,21 +240,56 @@ class TaskViewSet(viewsets.ModelViewSet):
                                    due_date=data.get("due_date"))
         serializer.instance = instance
 
+    def perform_update(self, serializer):
+        serializer.instance = svc.update_task(serializer.instance, **serializer.validated_data)
+
+    @extend_schema(
+        summary="Report: open tasks and estimate hours per assignee",
+        tags=["Reports"],
+        parameters=[
+            OpenApiParameter(name="assignee", required=False, location=OpenApiParameter.QUERY, description="User id"),
+        ],
+        responses={200: AssigneeWorkloadSerializer(many=True)},
+    )
+    @decorators.action(detail=False, methods=["get"], url_path="workload")
+    def workload(self, request):
+        assignee = _int_query_param(request, "assignee")
+        return response.Response(AssigneeWorkloadSerializer(sel.open_workloads(assignee), many=True).data)
+
+    @extend_schema(
+        summary="Report: overdue open tasks per assignee",
+        tags=["Reports"],
+        parameters=[
+            OpenApiParameter(name="assignee", required=False, location=OpenApiParameter.QUERY, description="User id"),
+        ],
+        responses={200: None},
+    )
+    @decorators.action(detail=False, methods=["get"], url_path="overdue")
+    def overdue(self, request):
+        assignee = _int_query_param(request, "assignee")
+        return response.Response(list(sel.overdue_by_assignee(timezone.localdate(), assignee)))
+
 @extend_schema_view(
-    list=extend_schema(summary="List time entries", tags=["TimeEntries"]),
-    retrieve=extend_schema(summary="Get time entry", tags=["TimeEntries"]),
-    create=extend_schema(summary="Create time entry", tags=["TimeEntries"]),
+    list=extend_schema(summary="List time entries", tags=["TimeEntries"], parameters=SPARSE_PARAMETERS),
+    retrieve=extend_schema(summary="Get time entry", tags=["TimeEntries"], parameters=SPARSE_PARAMETERS),
+    create=extend_schema(summary="Create time entry", tags=["TimeEntries"], parameters=IDEMPOTENCY_PARAMETERS),
     update=extend_schema(summary="Update time entry", tags=["TimeEntries"]),
     partial_update=extend_schema(summary="Patch time entry", tags=["TimeEntries"]),
     destroy=extend_schema(summary="Delete time entry", tags=["TimeEntries"]),
 )
-class TimeEntryViewSet(viewsets.ModelViewSet):
+class TimeEntryViewSet(IdempotentCreateMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = sel.time_entries_qs()
+    selector = staticmethod(sel.time_entries_qs)
     serializer_class = TimeEntrySerializer
     permission_classes = [IsProjectMemberOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = TimeEntryFilter
 
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = svc.log_time(task=data["task"], user=data["user"], date=data["date"],
+                                           hours=data["hours"], note=data.get("note"))
+
     @extend_schema(
         summary="Report: total hours by project",
         tags=["Reports"],
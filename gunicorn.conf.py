@@ -0,0 +1,36 @@
+import gc
+import os
+import time
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "3"))
+accesslog = "-"
+errorlog = "-"
+
+# Import Django, the URLconf and views once in the master; workers are forked
+# with everything already loaded instead of each importing it again.
+preload_app = True
+
+_master_started = time.monotonic()
+
+
+def when_ready(server):
+    server.log.info("Master ready in %.3fs", time.monotonic() - _master_started)
+
+
+def pre_fork(server, worker):
+    # Move preloaded objects out of the collector's reach so workers do not
+    # copy shared pages by touching their refcounts during GC.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from django.db import connections
+
+    # Never share a database connection opened in the master with a worker.
+    connections.close_all()
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s ready in %.3fs after fork", worker.pid, time.monotonic() - worker.forked_at)